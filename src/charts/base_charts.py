@@ -45,6 +45,7 @@ def create_plotly_chart(df, selected_columns, chart_title):
                             x=df['report_date_as_yyyy_mm_dd'],
                             y=df[col],
                             name=col.replace('_', ' ').title(),
+                            legendgroup=col,
                             line=dict(width=3, color=color),
                             opacity=0.8
                         ),
@@ -65,6 +66,7 @@ def create_plotly_chart(df, selected_columns, chart_title):
                                 textposition='top center',
                                 textfont=dict(size=12, color=color),
                                 showlegend=False,
+                                legendgroup=col,
                                 hovertemplate=f'{col.replace("_", " ").title()}<br>Latest: %{{y:,.0f}}<br>Date: {latest_date.strftime("%Y-%m-%d")}<extra></extra>'
                             ),
                             secondary_y=True
@@ -82,6 +84,7 @@ def create_plotly_chart(df, selected_columns, chart_title):
                             x=df['report_date_as_yyyy_mm_dd'],
                             y=df[col],
                             name=col.replace('_', ' ').title(),
+                            legendgroup=col,
                             line=dict(width=2, color=color)
                         ),
                         secondary_y=False
@@ -101,6 +104,7 @@ def create_plotly_chart(df, selected_columns, chart_title):
                                 textposition='top center',
                                 textfont=dict(size=12, color=color),
                                 showlegend=False,
+                                legendgroup=col,
                                 hovertemplate=f'{col.replace("_", " ").title()}<br>Latest: %{{y:,.0f}}<br>Date: {latest_date.strftime("%Y-%m-%d")}<extra></extra>'
                             ),
                             secondary_y=False
@@ -126,6 +130,7 @@ def create_plotly_chart(df, selected_columns, chart_title):
                             x=df['report_date_as_yyyy_mm_dd'],
                             y=df[col],
                             name=col.replace('_', ' ').title(),
+                            legendgroup=col,
                             line=dict(width=2, color=color),
                             mode='lines'
                         )
@@ -145,42 +150,34 @@ def create_plotly_chart(df, selected_columns, chart_title):
                                 textposition='top center',
                                 textfont=dict(size=12, color=color),
                                 showlegend=False,
+                                legendgroup=col,
                                 hovertemplate=f'{col.replace("_", " ").title()}<br>Latest: %{{y:,.0f}}<br>Date: {latest_date.strftime("%Y-%m-%d")}<extra></extra>'
                             )
                         )
 
             fig.update_yaxes(title_text="Positions (Contracts)")
         
-        # Add dashed lines from latest points to axes
+        # Add dashed guide lines from latest points to axes as one trace per column
+        # (in the column's legend group, so toggling the series hides its guides too)
         for col in selected_columns:
             if col in df.columns and col in latest_row.index:
                 latest_val = latest_row[col]
                 if latest_val is not None and not pd.isna(latest_val):
-                    # Determine which y-axis to use
-                    use_secondary = col in open_interest_cols and open_interest_cols and other_cols
-                    line_color = color_map.get(col, 'gray')
-                    
-                    # Vertical line from point to x-axis
-                    fig.add_shape(
-                        type="line",
-                        x0=latest_date, x1=latest_date,
-                        y0=latest_val, y1=0,
-                        line=dict(color=line_color, width=1, dash="dot"),
-                        opacity=0.3,
-                        yref="y2" if use_secondary else "y",
-                        layer="below"
-                    )
-                    
-                    # Horizontal line from point to y-axis
-                    fig.add_shape(
-                        type="line",
-                        x0=latest_date, x1=df['report_date_as_yyyy_mm_dd'].min(),
-                        y0=latest_val, y1=latest_val,
-                        line=dict(color=line_color, width=1, dash="dot"),
+                    guide_trace = go.Scatter(
+                        x=[df['report_date_as_yyyy_mm_dd'].min(), latest_date, latest_date],
+                        y=[latest_val, latest_val, 0],
+                        mode='lines',
+                        line=dict(color=color_map.get(col, 'gray'), width=1, dash="dot"),
                         opacity=0.3,
-                        yref="y2" if use_secondary else "y",
-                        layer="below"
+                        showlegend=False,
+                        legendgroup=col,
+                        hoverinfo='skip'
                     )
+                    if open_interest_cols and other_cols:
+                        # Determine which y-axis to use
+                        fig.add_trace(guide_trace, secondary_y=col in open_interest_cols)
+                    else:
+                        fig.add_trace(guide_trace)
 
         # Update layout
         fig.update_layout(
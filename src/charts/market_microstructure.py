@@ -220,18 +220,18 @@ def create_market_microstructure_analysis(df, instrument_name):
             hovertemplate='%{x}<br>Avg Position: %{y:,.0f} contracts<extra></extra>'
         ), row=1, col=1)
         
-        # Add ratio annotations
-        for i, cat_metric in enumerate(category_metrics):
-            if cat_metric['ratio_to_top_4'] > 0:
-                fig.add_annotation(
-                    x=cat_metric['category'],
-                    y=cat_metric['avg_position'],
-                    text=f"{cat_metric['ratio_to_top_4']:.1f}x",
-                    showarrow=True,
-                    arrowhead=2,
-                    yshift=20,
-                    row=1, col=1
-                )
+        # Add ratio labels as a single text trace
+        ratio_metrics = [m for m in category_metrics if m['ratio_to_top_4'] > 0]
+        if ratio_metrics:
+            fig.add_trace(go.Scatter(
+                x=[m['category'] for m in ratio_metrics],
+                y=[m['avg_position'] for m in ratio_metrics],
+                mode='text',
+                text=[f"{m['ratio_to_top_4']:.1f}x" for m in ratio_metrics],
+                textposition='top center',
+                showlegend=False,
+                hoverinfo='skip'
+            ), row=1, col=1)
         
         # Plot 2: Contract Distribution Breakdown
         # Shows actual contract numbers from concentration data
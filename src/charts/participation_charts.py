@@ -12,9 +12,8 @@ from config import PARTICIPATION_CHART_HEIGHT, CONCENTRATION_COLORS
 def create_participation_density_dashboard(df, instrument_name, percentile_data=None, concentration_type='Net'):
     """Create avg position per trader dashboard with concentration analysis"""
     try:
-        # Copy and prepare data
-        df_plot = df.copy()
-        df_plot = df_plot.sort_values('report_date_as_yyyy_mm_dd')
+        # Prepare data (sort_values returns a new frame, the input is not modified)
+        df_plot = df.sort_values('report_date_as_yyyy_mm_dd')
         
         # Calculate average position per trader
         df_plot['avg_pos_per_trader'] = df_plot['open_interest_all'] / df_plot['traders_tot_all']
@@ -50,14 +49,12 @@ def create_participation_density_dashboard(df, instrument_name, percentile_data=
         
         # Chart 1: Average Position per Trader (bars) with Total Traders (line)
         # Create color array based on concentration levels
-        bar_colors = []
-        for conc in df_plot['concentration_4']:
-            if conc < 15:
-                bar_colors.append(CONCENTRATION_COLORS['low'])
-            elif conc < 25:
-                bar_colors.append(CONCENTRATION_COLORS['medium'])
-            else:
-                bar_colors.append(CONCENTRATION_COLORS['high'])
+        concentration = df_plot['concentration_4']
+        bar_colors = np.select(
+            [concentration < 15, concentration < 25],
+            [CONCENTRATION_COLORS['low'], CONCENTRATION_COLORS['medium']],
+            default=CONCENTRATION_COLORS['high']
+        )
         
         fig.add_trace(
             go.Bar(
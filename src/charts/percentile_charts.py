@@ -8,50 +8,31 @@ import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from scipy import stats
+from rolling_percentiles import rolling_percentile_ranks
 
 
 def create_percentile_chart(df, column, lookback_years=5, chart_type='time_series'):
     """Create percentile chart - time series, distribution, or cumulative curve"""
     try:
-        df_pct = df.copy()
-        df_pct['year'] = df_pct['report_date_as_yyyy_mm_dd'].dt.year
-        current_year = df_pct['year'].max()
+        # Only the report date and the selected column are used below
+        df_pct = df[['report_date_as_yyyy_mm_dd', column]]
+        if not df_pct['report_date_as_yyyy_mm_dd'].is_monotonic_increasing:
+            df_pct = df_pct.sort_values('report_date_as_yyyy_mm_dd')
 
         # Always show all data for display
         # The time range buttons in the chart will handle filtering
-        df_display = df_pct.copy()
+        df_display = pd.DataFrame({'report_date_as_yyyy_mm_dd': df_pct['report_date_as_yyyy_mm_dd']})
 
         if chart_type == 'time_series':
-            # Calculate rolling percentile rank
-            # Use the specified lookback period for the rolling window
-            if lookback_years == 'all':
-                window_days = None  # Use all available data
-            else:
-                window_days = 365 * lookback_years  # Use calendar days to match distribution view
-            
-            df_display['percentile_rank'] = np.nan
-            df_display['actual_value'] = df_display[column]
+            # Calculate rolling percentile rank over the specified lookback window
+            # (calendar years, matching the distribution view; all data up to each date for 'all')
+            lookback = None if lookback_years == 'all' else pd.DateOffset(years=lookback_years)
             
-            # Calculate percentile for each point
-            for idx in range(len(df_display)):
-                current_date = df_display.iloc[idx]['report_date_as_yyyy_mm_dd']
-                current_value = df_display.iloc[idx][column]
-                
-                # Define the lookback window
-                if window_days is None:
-                    # Use all available data up to current date
-                    mask = df_pct['report_date_as_yyyy_mm_dd'] <= current_date
-                else:
-                    # Use fixed window matching distribution view calculation
-                    window_start = current_date - pd.DateOffset(years=lookback_years)
-                    mask = (df_pct['report_date_as_yyyy_mm_dd'] >= window_start) & \
-                           (df_pct['report_date_as_yyyy_mm_dd'] <= current_date)
-                
-                window_values = df_pct.loc[mask, column].values
-                
-                if len(window_values) > 1:
-                    percentile = (window_values < current_value).sum() / len(window_values) * 100
-                    df_display.iloc[idx, df_display.columns.get_loc('percentile_rank')] = percentile
+            df_display['percentile_rank'] = rolling_percentile_ranks(
+                df_display['report_date_as_yyyy_mm_dd'], df_pct[column].to_numpy(), lookback,
+                min_periods=2, fill_value=np.nan
+            )[:, 0]
+            df_display['actual_value'] = df_pct[column]
 
             # Remove NaN values
             df_display = df_display.dropna(subset=['percentile_rank'])
@@ -101,9 +82,8 @@ def create_percentile_chart(df, column, lookback_years=5, chart_type='time_serie
                                 x=1.02
                             )
                         ),
-                        text=df_display['actual_value'].round(0).astype(str),
-                        textposition='none',
-                        hovertemplate='Date: %{x|%Y-%m-%d}<br>Percentile: %{y:.1f}%<br>Value: %{text}<extra></extra>'
+                        customdata=df_display['actual_value'],
+                        hovertemplate='Date: %{x|%Y-%m-%d}<br>Percentile: %{y:.1f}%<br>Value: %{customdata:.0f}<extra></extra>'
                     ),
                     row=1, col=1
                 )
@@ -118,8 +98,8 @@ def create_percentile_chart(df, column, lookback_years=5, chart_type='time_serie
                         name='Percentile Rank',
                         line=dict(color='blue', width=2),
                         fillcolor='rgba(0, 100, 255, 0.3)',
-                        hovertemplate='Date: %{x|%Y-%m-%d}<br>Percentile: %{y:.1f}%<br>Value: ' + 
-                                     df_display['actual_value'].round(0).astype(str) + '<extra></extra>'
+                        customdata=df_display['actual_value'],
+                        hovertemplate='Date: %{x|%Y-%m-%d}<br>Percentile: %{y:.1f}%<br>Value: %{customdata:.0f}<extra></extra>'
                     ),
                     row=1, col=1
                 )
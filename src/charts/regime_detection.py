@@ -5,90 +5,95 @@ Complete implementation from legacyF.py
 import streamlit as st
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import pandas as pd
 import numpy as np
+from config import REGIME_COLORS
 try:
     from config import PARTICIPATION_CHART_HEIGHT
 except ImportError:
     PARTICIPATION_CHART_HEIGHT = 600
 
 
+def compute_regime_metrics(df):
+    """Percentile ranks, extremity score and regime label/colour for each report"""
+    df_regime = df.copy()
+    window = 52
+    min_periods = 26
+    
+    # Net positions
+    df_regime['comm_net'] = df_regime['comm_positions_long_all'] - df_regime['comm_positions_short_all']
+    df_regime['noncomm_net'] = df_regime['noncomm_positions_long_all'] - df_regime['noncomm_positions_short_all']
+
+    # Flow intensity
+    df_regime[['comm_flow', 'noncomm_flow']] = df_regime[['comm_net', 'noncomm_net']].diff().to_numpy()
+    df_regime['flow_intensity'] = abs(df_regime['comm_flow']) + abs(df_regime['noncomm_flow'])
+
+    # Step 1: Calculate all percentile metrics in a single rolling pass
+    percentile_sources = {
+        'long_conc_pct': 'conc_gross_le_4_tdr_long',
+        'short_conc_pct': 'conc_gross_le_4_tdr_short',
+        'comm_net_pct': 'comm_net',
+        'noncomm_net_pct': 'noncomm_net',
+        'flow_pct': 'flow_intensity',
+        'trader_total_pct': 'traders_tot_all'
+    }
+    percentile_ranks = df_regime[list(percentile_sources.values())].rolling(window, min_periods=min_periods).rank(pct=True) * 100
+    df_regime[list(percentile_sources.keys())] = percentile_ranks.to_numpy()
+    
+    # Placeholder for heterogeneity
+    df_regime['heterogeneity_pct'] = 50  # Would use actual heterogeneity index
+    
+    # Step 2: Calculate regime extremity score
+    def distance_from_center(pct):
+        return abs(pct - 50) * 2
+
+    def pairwise_max(a, b):
+        # Same NaN behaviour as the builtin max(a, b)
+        return np.where(b > a, b, a)
+
+    df_regime['regime_extremity'] = (
+        pairwise_max(distance_from_center(df_regime['long_conc_pct']),
+                     distance_from_center(df_regime['short_conc_pct'])) * 0.25 +
+        pairwise_max(distance_from_center(df_regime['comm_net_pct']),
+                     distance_from_center(df_regime['noncomm_net_pct'])) * 0.25 +
+        df_regime['flow_pct'] * 0.25 +
+        df_regime['heterogeneity_pct'] * 0.25
+    )
+
+    # Step 3: Detect regime
+    EXTREME_HIGH = 85
+    EXTREME_LOW = 15
+    MODERATE_HIGH = 70
+    MODERATE_LOW = 30
+
+    long_pct = df_regime['long_conc_pct']
+    short_pct = df_regime['short_conc_pct']
+    comm_pct = df_regime['comm_net_pct']
+    noncomm_pct = df_regime['noncomm_net_pct']
+
+    # Checked in order - first matching pattern wins
+    regime_rules = [
+        (long_pct.isna(), "Insufficient Data", "gray"),
+        ((long_pct > EXTREME_HIGH) & (short_pct < MODERATE_LOW), "Long Concentration Extreme", "red"),
+        ((short_pct > EXTREME_HIGH) & (long_pct < MODERATE_LOW), "Short Concentration Extreme", "red"),
+        ((long_pct > EXTREME_HIGH) & (short_pct > EXTREME_HIGH), "Bilateral Concentration", "orange"),
+        ((noncomm_pct > EXTREME_HIGH) & (comm_pct < EXTREME_LOW), "Speculative Long Extreme", "red"),
+        ((noncomm_pct < EXTREME_LOW) & (comm_pct > EXTREME_HIGH), "Commercial Long Extreme", "orange"),
+        (df_regime['flow_pct'] > EXTREME_HIGH, "High Flow Volatility", "yellow"),
+        (df_regime['heterogeneity_pct'] > EXTREME_HIGH, "Maximum Divergence", "red"),
+        (df_regime['regime_extremity'] < 40, "Balanced Market", "green"),
+    ]
+    conditions = [cond for cond, _, _ in regime_rules]
+    df_regime['regime'] = np.select(conditions, [regime for _, regime, _ in regime_rules], default="Transitional")
+    df_regime['regime_color'] = np.select(conditions, [color for _, _, color in regime_rules], default="gray")
+
+    return df_regime
+
+
 def create_regime_detection_dashboard(df, instrument_name):
     """Create comprehensive regime detection analysis"""
     try:
         # Calculate regime metrics
-        df_regime = df.copy()
-        window = 52
-        min_periods = 26
-        
-        # Step 1: Calculate all percentile metrics
-        df_regime['long_conc_pct'] = df_regime['conc_gross_le_4_tdr_long'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-        df_regime['short_conc_pct'] = df_regime['conc_gross_le_4_tdr_short'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-        
-        # Net positions
-        df_regime['comm_net'] = df_regime['comm_positions_long_all'] - df_regime['comm_positions_short_all']
-        df_regime['noncomm_net'] = df_regime['noncomm_positions_long_all'] - df_regime['noncomm_positions_short_all']
-        df_regime['comm_net_pct'] = df_regime['comm_net'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-        df_regime['noncomm_net_pct'] = df_regime['noncomm_net'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-        
-        # Flow intensity
-        df_regime['comm_flow'] = df_regime['comm_net'].diff()
-        df_regime['noncomm_flow'] = df_regime['noncomm_net'].diff()
-        df_regime['flow_intensity'] = abs(df_regime['comm_flow']) + abs(df_regime['noncomm_flow'])
-        df_regime['flow_pct'] = df_regime['flow_intensity'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-        
-        # Trader participation
-        df_regime['trader_total_pct'] = df_regime['traders_tot_all'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-        
-        # Placeholder for heterogeneity
-        df_regime['heterogeneity_pct'] = 50  # Would use actual heterogeneity index
-        
-        # Step 2: Calculate regime extremity score
-        def distance_from_center(pct):
-            return abs(pct - 50) * 2
-        
-        df_regime['regime_extremity'] = df_regime.apply(lambda row: 
-            max(distance_from_center(row['long_conc_pct']), 
-                distance_from_center(row['short_conc_pct'])) * 0.25 +
-            max(distance_from_center(row['comm_net_pct']), 
-                distance_from_center(row['noncomm_net_pct'])) * 0.25 +
-            row['flow_pct'] * 0.25 +
-            row['heterogeneity_pct'] * 0.25
-        , axis=1)
-        
-        # Step 3: Detect regime
-        def detect_regime(row):
-            EXTREME_HIGH = 85
-            EXTREME_LOW = 15
-            MODERATE_HIGH = 70
-            MODERATE_LOW = 30
-            
-            if pd.isna(row['long_conc_pct']):
-                return "Insufficient Data", "gray"
-            
-            # Check patterns
-            if row['long_conc_pct'] > EXTREME_HIGH and row['short_conc_pct'] < MODERATE_LOW:
-                return "Long Concentration Extreme", "red"
-            elif row['short_conc_pct'] > EXTREME_HIGH and row['long_conc_pct'] < MODERATE_LOW:
-                return "Short Concentration Extreme", "red"
-            elif row['long_conc_pct'] > EXTREME_HIGH and row['short_conc_pct'] > EXTREME_HIGH:
-                return "Bilateral Concentration", "orange"
-            elif row['noncomm_net_pct'] > EXTREME_HIGH and row['comm_net_pct'] < EXTREME_LOW:
-                return "Speculative Long Extreme", "red"
-            elif row['noncomm_net_pct'] < EXTREME_LOW and row['comm_net_pct'] > EXTREME_HIGH:
-                return "Commercial Long Extreme", "orange"
-            elif row['flow_pct'] > EXTREME_HIGH:
-                return "High Flow Volatility", "yellow"
-            elif row['heterogeneity_pct'] > EXTREME_HIGH:
-                return "Maximum Divergence", "red"
-            elif row['regime_extremity'] < 40:
-                return "Balanced Market", "green"
-            else:
-                return "Transitional", "gray"
-        
-        df_regime[['regime', 'regime_color']] = df_regime.apply(
-            lambda row: pd.Series(detect_regime(row)), axis=1
-        )
+        df_regime = compute_regime_metrics(df)
         
         # Get latest values
         latest = df_regime.iloc[-1]
@@ -201,22 +206,8 @@ def create_regime_detection_dashboard(df, instrument_name):
         # 4. Regime timeline
         timeline_data = df_regime.tail(52).copy()
         
-        # Create color mapping
-        color_map = {
-            'Long Concentration Extreme': 'darkred',
-            'Short Concentration Extreme': 'darkred',
-            'Bilateral Concentration': 'orange',
-            'Speculative Long Extreme': 'red',
-            'Commercial Long Extreme': 'darkorange',
-            'High Flow Volatility': 'gold',
-            'Maximum Divergence': 'darkred',
-            'Balanced Market': 'green',
-            'Transitional': 'gray',
-            'Insufficient Data': 'lightgray'
-        }
-        
         # Plot regime timeline
-        for regime, color in color_map.items():
+        for regime, color in REGIME_COLORS.items():
             mask = timeline_data['regime'] == regime
             if mask.any():
                 fig.add_trace(go.Scatter(
@@ -37,8 +37,9 @@ def create_market_concentration_flow(df, instrument_name):
         df_flow = df_flow.sort_values('report_date_as_yyyy_mm_dd')
         
         # Calculate flows
-        df_flow['trader_flow'] = df_flow['traders_tot_all'].diff()
-        df_flow['concentration_change'] = df_flow['conc_net_le_4_tdr_long_all'].diff()
+        df_flow[['trader_flow', 'concentration_change']] = (
+            df_flow[['traders_tot_all', 'conc_net_le_4_tdr_long_all']].diff().to_numpy()
+        )
         
         # Create visualization
         fig = make_subplots(
@@ -792,8 +793,7 @@ def create_heterogeneity_index(df, instrument_name, component_view="Full Index")
         flow_min_periods = 26
         
         # Calculate week-over-week changes in net positions
-        df_hetero['comm_flow'] = df_hetero['comm_net'].diff()
-        df_hetero['noncomm_flow'] = df_hetero['noncomm_net'].diff()
+        df_hetero[['comm_flow', 'noncomm_flow']] = df_hetero[['comm_net', 'noncomm_net']].diff().to_numpy()
         
         # Calculate z-scores of flows (measure of urgency)
         df_hetero['comm_flow_mean'] = df_hetero['comm_flow'].rolling(flow_window, min_periods=flow_min_periods).mean()
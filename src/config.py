@@ -15,6 +15,11 @@ CFTC_API_BASE = "publicreporting.cftc.gov"
 DATASET_CODE = "6dca-aqww"
 DEFAULT_LIMIT = 3000
 
+# On-disk cache for API responses (survives process restarts)
+CACHE_DIR = ".cache/cftc"
+CACHE_TTL = 3600  # seconds
+CACHE_MAX_AGE = 3 * 24 * 3600  # seconds - refetch the full history after this
+
 # Chart settings
 CHART_HEIGHT = 600
 PARTICIPATION_CHART_HEIGHT = 900
@@ -26,6 +31,19 @@ CONCENTRATION_COLORS = {
     "high": "red"        # >25%
 }
 
+REGIME_COLORS = {
+    "Long Concentration Extreme": "darkred",
+    "Short Concentration Extreme": "darkred",
+    "Bilateral Concentration": "orange",
+    "Speculative Long Extreme": "red",
+    "Commercial Long Extreme": "darkorange",
+    "High Flow Volatility": "gold",
+    "Maximum Divergence": "darkred",
+    "Balanced Market": "green",
+    "Transitional": "gray",
+    "Insufficient Data": "lightgray"
+}
+
 # Data columns
 CFTC_COLUMNS = [
     "report_date_as_yyyy_mm_dd",
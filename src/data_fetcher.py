@@ -5,9 +5,34 @@ import streamlit as st
 import pandas as pd
 from sodapy import Socrata
 import json
-from config import CFTC_API_BASE, DATASET_CODE, DEFAULT_LIMIT, CFTC_COLUMNS
+import requests
+import hashlib
+import os
+import tempfile
+import time
+from config import CFTC_API_BASE, DATASET_CODE, DEFAULT_LIMIT, CFTC_COLUMNS, CACHE_DIR, CACHE_TTL, CACHE_MAX_AGE
 from historical_data_loader import get_historical_data_for_instrument, check_data_gap
 
+# Timestamp format of report_date_as_yyyy_mm_dd in Socrata responses, e.g. 2024-01-02T00:00:00.000
+SOCRATA_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+
+def socrata_get(client, **query):
+    """Query the CFTC dataset through the client's session, parsing the JSON response with orjson when available"""
+    response = client.session.get(
+        f"{client.uri_prefix}{client.domain}/resource/{DATASET_CODE}.json",
+        params={f"${key}": value for key, value in query.items()},
+        timeout=client.timeout
+    )
+    response.raise_for_status()
+    return _json_loads(response.content)
+
 
 @st.cache_data
 def load_instruments_database():
@@ -34,6 +59,110 @@ def load_instruments_database():
         return None
 
 
+def get_cache_path(instrument_name):
+    """On-disk cache location for an instrument's API data"""
+    # Column list is part of the key so a schema change starts a fresh cache
+    key = hashlib.md5((instrument_name + DATASET_CODE + str(DEFAULT_LIMIT) + ",".join(CFTC_COLUMNS)).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.parquet")
+
+
+def read_cached_frame(path):
+    """Load a cached DataFrame and its age in seconds, or (None, None) if there is no usable cache"""
+    try:
+        age = time.time() - os.path.getmtime(path)
+        return pd.read_parquet(path), age
+    except (OSError, ValueError):
+        # Missing or unreadable cache file - fall back to the API
+        return None, None
+
+
+def write_cached_frame(path, df):
+    """Persist a DataFrame to the on-disk cache, ignoring failures (e.g. read-only filesystem)"""
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and swap it in, so other sessions never read a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        df.to_parquet(tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+    except (OSError, ImportError, ValueError):
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def fetch_api_data(instrument_name_clean, api_token, since=None):
+    """Fetch and convert CFTC API data for an instrument (without historical stitching)
+
+    If since is given, only reports dated on or after it are requested (the report
+    at since is fetched again so corrections to it are picked up).
+    """
+    client = Socrata(CFTC_API_BASE, api_token)
+    date_filter = f" AND report_date_as_yyyy_mm_dd >= '{since:%Y-%m-%dT%H:%M:%S.000}'" if since is not None else ""
+
+    # Special handling for WTI-PHYSICAL: merge with historical CRUDE OIL, LIGHT SWEET data
+    if instrument_name_clean == "WTI-PHYSICAL - NEW YORK MERCANTILE EXCHANGE":
+        # First, get historical data from CRUDE OIL, LIGHT SWEET (2000-2022)
+        historical_results = socrata_get(
+            client,
+            where="market_and_exchange_names='CRUDE OIL, LIGHT SWEET - NEW YORK MERCANTILE EXCHANGE'" + date_filter,
+            select=",".join(CFTC_COLUMNS),
+            order="report_date_as_yyyy_mm_dd ASC",
+            limit=DEFAULT_LIMIT
+        )
+        
+        # Then get current data from WTI-PHYSICAL (2022-present)
+        current_results = socrata_get(
+            client,
+            where="market_and_exchange_names='WTI-PHYSICAL - NEW YORK MERCANTILE EXCHANGE'" + date_filter,
+            select=",".join(CFTC_COLUMNS),
+            order="report_date_as_yyyy_mm_dd ASC",
+            limit=DEFAULT_LIMIT
+        )
+        
+        # Merge the results
+        results = historical_results + current_results
+        
+    else:
+        # Standard fetch for all other instruments
+        results = socrata_get(
+            client,
+            where=f"market_and_exchange_names='{instrument_name_clean}'" + date_filter,
+            select=",".join(CFTC_COLUMNS),
+            order="report_date_as_yyyy_mm_dd ASC",
+            limit=DEFAULT_LIMIT
+        )
+
+    client.close()
+
+    if not results:
+        return None
+
+    # Convert to DataFrame with a fixed column set (fields missing from a record become NaN)
+    df = pd.DataFrame.from_records(results, columns=CFTC_COLUMNS)
+
+    # Convert date column
+    df['report_date_as_yyyy_mm_dd'] = pd.to_datetime(df['report_date_as_yyyy_mm_dd'], format=SOCRATA_DATE_FORMAT, cache=True)
+    
+    # Remove duplicates based on date (in case of overlapping data at transition)
+    df = df.drop_duplicates(subset=['report_date_as_yyyy_mm_dd'], keep='last')
+
+    # Convert numeric columns
+    numeric_columns = [col for col in CFTC_COLUMNS if
+                       col != "report_date_as_yyyy_mm_dd" and col != "market_and_exchange_names"]
+    df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce').astype('float64')
+
+    # Calculate additional metrics (net = long - short) in a single array subtraction
+    long_positions = df[['noncomm_positions_long_all', 'comm_positions_long_all', 'tot_rept_positions_long_all']].to_numpy()
+    short_positions = df[['noncomm_positions_short_all', 'comm_positions_short_all', 'tot_rept_positions_short']].to_numpy()
+    df[['net_noncomm_positions', 'net_comm_positions', 'net_reportable_positions']] = long_positions - short_positions
+
+    return df
+
+
 @st.cache_data(ttl=3600)  # Cache for 1 hour
 def fetch_cftc_data(instrument_name, api_token):
     """Fetch CFTC data for a specific instrument with historical data stitching"""
@@ -46,66 +175,41 @@ def fetch_cftc_data(instrument_name, api_token):
         else:
             instrument_name_clean = instrument_name
             
-        client = Socrata(CFTC_API_BASE, api_token)
-
-        # Special handling for WTI-PHYSICAL: merge with historical CRUDE OIL, LIGHT SWEET data
-        if instrument_name_clean == "WTI-PHYSICAL - NEW YORK MERCANTILE EXCHANGE":
-            # First, get historical data from CRUDE OIL, LIGHT SWEET (2000-2022)
-            historical_results = client.get(
-                DATASET_CODE,
-                where="market_and_exchange_names='CRUDE OIL, LIGHT SWEET - NEW YORK MERCANTILE EXCHANGE'",
-                select=",".join(CFTC_COLUMNS),
-                order="report_date_as_yyyy_mm_dd ASC",
-                limit=DEFAULT_LIMIT
-            )
-            
-            # Then get current data from WTI-PHYSICAL (2022-present)
-            current_results = client.get(
-                DATASET_CODE,
-                where="market_and_exchange_names='WTI-PHYSICAL - NEW YORK MERCANTILE EXCHANGE'",
-                select=",".join(CFTC_COLUMNS),
-                order="report_date_as_yyyy_mm_dd ASC",
-                limit=DEFAULT_LIMIT
-            )
-            
-            # Merge the results
-            results = historical_results + current_results
-            
+        # API data, served from the on-disk cache while it is fresh
+        cache_path = get_cache_path(instrument_name_clean)
+        cached_df, cache_age = read_cached_frame(cache_path)
+        if cached_df is not None and cache_age < CACHE_TTL:
+            df = cached_df
         else:
-            # Standard fetch for all other instruments
-            results = client.get(
-                DATASET_CODE,
-                where=f"market_and_exchange_names='{instrument_name_clean}'",
-                select=",".join(CFTC_COLUMNS),
-                order="report_date_as_yyyy_mm_dd ASC",
-                limit=DEFAULT_LIMIT
-            )
-
-        client.close()
-
-        if not results:
-            return None
-
-        # Convert to DataFrame
-        df = pd.DataFrame(results)
-
-        # Convert date column
-        df['report_date_as_yyyy_mm_dd'] = pd.to_datetime(df['report_date_as_yyyy_mm_dd'])
-        
-        # Remove duplicates based on date (in case of overlapping data at transition)
-        df = df.drop_duplicates(subset=['report_date_as_yyyy_mm_dd'], keep='last')
-
-        # Convert numeric columns
-        numeric_columns = [col for col in CFTC_COLUMNS if
-                           col != "report_date_as_yyyy_mm_dd" and col != "market_and_exchange_names"]
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-
-        # Calculate additional metrics
-        df['net_noncomm_positions'] = df['noncomm_positions_long_all'] - df['noncomm_positions_short_all']
-        df['net_comm_positions'] = df['comm_positions_long_all'] - df['comm_positions_short_all']
-        df['net_reportable_positions'] = df['tot_rept_positions_long_all'] - df['tot_rept_positions_short']
+            # Patch the cache with the latest reports, or refetch the full history once
+            # it is older than CACHE_MAX_AGE so revisions to earlier reports are picked up
+            full_fetch_time = cached_df.attrs.get('full_fetch_time', 0) if cached_df is not None else 0
+            incremental = cached_df is not None and time.time() - full_fetch_time < CACHE_MAX_AGE
+            since = cached_df['report_date_as_yyyy_mm_dd'].max() if incremental else None
+            try:
+                new_df = fetch_api_data(instrument_name_clean, api_token, since=since)
+            except (requests.RequestException, json.JSONDecodeError):
+                if cached_df is None:
+                    raise
+                # Serve the cached data while the API is unavailable; the cache file is left
+                # untouched so the next run retries instead of treating it as fresh
+                latest_cached = cached_df['report_date_as_yyyy_mm_dd'].max()
+                st.warning(f"Could not reach the CFTC API - showing cached data up to {latest_cached:%Y-%m-%d}")
+                df = cached_df
+            else:
+                if new_df is None:
+                    df = cached_df
+                elif incremental:
+                    df = pd.concat([cached_df, new_df], ignore_index=True)
+                    df = df.drop_duplicates(subset=['report_date_as_yyyy_mm_dd'], keep='last')
+                    df.attrs['full_fetch_time'] = full_fetch_time
+                else:
+                    df = new_df
+                    df.attrs['full_fetch_time'] = time.time()
+                if df is None:
+                    return None
+                # Rewrite even without new rows so the cache age is reset
+                write_cached_frame(cache_path, df)
         
         # Now try to stitch historical data (pre-2000) if available
         # For WTI, we already handle 2000-2022, so check for pre-2000 data
@@ -161,7 +265,20 @@ def fetch_cftc_data(instrument_name, api_token):
                     if 'tot_rept_positions_long_all' in df.columns and 'tot_rept_positions_short' in df.columns:
                         df['net_reportable_positions'] = df['tot_rept_positions_long_all'] - df['tot_rept_positions_short']
 
-        return df.sort_values('report_date_as_yyyy_mm_dd')
+        # Store numeric columns as float32 - positions and trader counts stay exact
+        # below 2**24, and it halves memory, cache hashing and chart payloads
+        float_columns = df.select_dtypes(include='float64').columns
+        df[float_columns] = df[float_columns].astype('float32')
+
+        # One instrument name repeated on every row - store it as a category
+        df['market_and_exchange_names'] = df['market_and_exchange_names'].astype('category')
+
+        # The API returns rows in date order; only the WTI merge or historical
+        # stitching can leave them out of order
+        if not df['report_date_as_yyyy_mm_dd'].is_monotonic_increasing:
+            df = df.sort_values('report_date_as_yyyy_mm_dd')
+
+        return df
 
     except Exception as e:
         st.error(f"Error fetching data: {e}")
@@ -201,8 +318,8 @@ def fetch_cftc_data_ytd_only(instrument_name, api_token):
         # Special handling for WTI-PHYSICAL
         if instrument_name_clean == "WTI-PHYSICAL - NEW YORK MERCANTILE EXCHANGE":
             # For WTI, just get YTD data from the current instrument
-            results = client.get(
-                DATASET_CODE,
+            results = socrata_get(
+                client,
                 where=f"market_and_exchange_names='WTI-PHYSICAL - NEW YORK MERCANTILE EXCHANGE' AND report_date_as_yyyy_mm_dd >= '{year_start}'",
                 select=",".join(dashboard_columns),
                 order="report_date_as_yyyy_mm_dd ASC",
@@ -210,8 +327,8 @@ def fetch_cftc_data_ytd_only(instrument_name, api_token):
             )
         else:
             # Standard fetch for YTD data only
-            results = client.get(
-                DATASET_CODE,
+            results = socrata_get(
+                client,
                 where=f"market_and_exchange_names='{instrument_name_clean}' AND report_date_as_yyyy_mm_dd >= '{year_start}'",
                 select=",".join(dashboard_columns),
                 order="report_date_as_yyyy_mm_dd ASC",
@@ -221,22 +338,21 @@ def fetch_cftc_data_ytd_only(instrument_name, api_token):
         if not results:
             return None
             
-        df = pd.DataFrame.from_records(results)
+        df = pd.DataFrame.from_records(results, columns=dashboard_columns)
         
         # Convert date column
-        df['report_date_as_yyyy_mm_dd'] = pd.to_datetime(df['report_date_as_yyyy_mm_dd'])
+        df['report_date_as_yyyy_mm_dd'] = pd.to_datetime(df['report_date_as_yyyy_mm_dd'], format=SOCRATA_DATE_FORMAT, cache=True)
         
         # Convert numeric columns
         numeric_columns = [col for col in dashboard_columns if col != 'report_date_as_yyyy_mm_dd']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+        df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce').astype('float64')
         
         # Calculate net positions
         if 'noncomm_positions_long_all' in df.columns and 'noncomm_positions_short_all' in df.columns:
             df['net_noncomm_positions'] = df['noncomm_positions_long_all'] - df['noncomm_positions_short_all']
         
-        return df.sort_values('report_date_as_yyyy_mm_dd')
+        # Already in date order (the query sorts by report date ascending)
+        return df
         
     except Exception as e:
         st.error(f"Error fetching YTD data: {e}")
@@ -21,82 +21,58 @@ from charts.trader_participation_analysis import (
 )
 from charts.concentration_momentum import create_concentration_momentum_analysis
 from charts.participant_behavior_clusters import create_participant_behavior_clusters
-from charts.regime_detection import create_regime_detection_dashboard
+from charts.regime_detection import create_regime_detection_dashboard, compute_regime_metrics
 from charts.market_microstructure import create_market_microstructure_analysis
+from rolling_percentiles import rolling_percentile_ranks
+from config import REGIME_COLORS
 
 
-def calculate_percentiles_for_column(df, column, lookback_days):
-    """Calculate rolling percentiles for a specific column - EXACT from legacyF.py"""
-    percentiles = []
-    for i in range(len(df)):
-        current_date = df.iloc[i]['report_date_as_yyyy_mm_dd']
-        current_val = df.iloc[i][column]
-        
-        if pd.isna(current_val):
-            percentiles.append(50)
-            continue
-            
-        if lookback_days == "since_2010":
-            lookback_start = pd.Timestamp('2010-01-01')
-            window_data = df[(df['report_date_as_yyyy_mm_dd'] >= lookback_start) & 
-                           (df['report_date_as_yyyy_mm_dd'] <= current_date)]
-        elif lookback_days:
-            lookback_start = current_date - pd.Timedelta(days=lookback_days)
-            window_data = df[(df['report_date_as_yyyy_mm_dd'] >= lookback_start) & 
-                           (df['report_date_as_yyyy_mm_dd'] <= current_date)]
-        else:
-            window_data = df[df['report_date_as_yyyy_mm_dd'] <= current_date]
-        
-        valid_data = window_data[column].dropna()
-        if len(valid_data) > 0:
-            percentile = (valid_data < current_val).sum() / len(valid_data) * 100
-            percentiles.append(percentile)
-        else:
-            percentiles.append(50)
+# Participation categories: (avg column, title, trader count column, position column)
+PARTICIPATION_CATEGORIES = [
+    ('avg_pos_per_trader', 'Overall Average', 'traders_tot_all', 'open_interest_all'),
+    ('avg_noncomm_long', 'Non-Commercial Long', 'traders_noncomm_long_all', 'noncomm_positions_long_all'),
+    ('avg_noncomm_short', 'Non-Commercial Short', 'traders_noncomm_short_all', 'noncomm_positions_short_all'),
+    ('avg_noncomm_spread', 'Non-Commercial Spread', 'traders_noncomm_spread_all', 'noncomm_postions_spread_all'),
+    ('avg_comm_long', 'Commercial Long', 'traders_comm_long_all', 'comm_positions_long_all'),
+    ('avg_comm_short', 'Commercial Short', 'traders_comm_short_all', 'comm_positions_short_all'),
+    ('avg_rept_long', 'Total Long', 'traders_tot_rept_long_all', 'tot_rept_positions_long_all'),
+    ('avg_rept_short', 'Total Short', 'traders_tot_rept_short_all', 'tot_rept_positions_short')
+]
+
+
+@st.cache_data(show_spinner=False)
+def compute_participation_metrics(df, lookback_days, category_cols):
+    """Average position per trader and its rolling percentile for the selected participation categories"""
+    df_plot = df.sort_values('report_date_as_yyyy_mm_dd')
+    
+    # Average position per trader, only for the categories being plotted
+    for col, title, trader_col, position_col in PARTICIPATION_CATEGORIES:
+        if col in category_cols:
+            df_plot[col] = df_plot[position_col] / df_plot[trader_col]
+    
+    # Percentiles for all selected categories in one pass
+    category_cols = list(category_cols)
+    percentiles = rolling_percentile_ranks(
+        df_plot['report_date_as_yyyy_mm_dd'], df_plot[category_cols].to_numpy(), lookback_days
+    )
+    for i, col in enumerate(category_cols):
+        df_plot[f'{col}_percentile'] = percentiles[:, i]
     
-    return percentiles
+    return df_plot
 
 
-def create_participation_density_dashboard_original(df, instrument_name, percentile_data=None, lookback_days=None):
+def create_participation_density_dashboard_original(df, instrument_name, percentile_data=None, lookback_days=None,
+                                                    selected_categories=None):
     """Create comprehensive avg position per trader dashboard for all categories - EXACT from legacyF.py"""
     try:
-        # Copy and prepare data
-        df_plot = df.copy()
-        df_plot = df_plot.sort_values('report_date_as_yyyy_mm_dd')
-        
-        # Calculate average position per trader for overall and each category
-        # Overall
-        df_plot['avg_pos_per_trader'] = df_plot['open_interest_all'] / df_plot['traders_tot_all']
-        
-        # Non-Commercial
-        df_plot['avg_noncomm_long'] = df_plot['noncomm_positions_long_all'] / df_plot['traders_noncomm_long_all']
-        df_plot['avg_noncomm_short'] = df_plot['noncomm_positions_short_all'] / df_plot['traders_noncomm_short_all']
-        df_plot['avg_noncomm_spread'] = df_plot['noncomm_postions_spread_all'] / df_plot['traders_noncomm_spread_all']
-        
-        # Commercial
-        df_plot['avg_comm_long'] = df_plot['comm_positions_long_all'] / df_plot['traders_comm_long_all']
-        df_plot['avg_comm_short'] = df_plot['comm_positions_short_all'] / df_plot['traders_comm_short_all']
+        # Define categories to plot (all of them unless a subset was selected)
+        categories = [(col, title, trader_col) for col, title, trader_col, position_col in PARTICIPATION_CATEGORIES
+                      if selected_categories is None or col in selected_categories]
+        if not categories:
+            return None
         
-        # Total Reportable
-        df_plot['avg_rept_long'] = df_plot['tot_rept_positions_long_all'] / df_plot['traders_tot_rept_long_all']
-        df_plot['avg_rept_short'] = df_plot['tot_rept_positions_short'] / df_plot['traders_tot_rept_short_all']
-        
-        # Define categories to plot
-        categories = [
-            ('avg_pos_per_trader', 'Overall Average', 'traders_tot_all'),
-            ('avg_noncomm_long', 'Non-Commercial Long', 'traders_noncomm_long_all'),
-            ('avg_noncomm_short', 'Non-Commercial Short', 'traders_noncomm_short_all'),
-            ('avg_noncomm_spread', 'Non-Commercial Spread', 'traders_noncomm_spread_all'),
-            ('avg_comm_long', 'Commercial Long', 'traders_comm_long_all'),
-            ('avg_comm_short', 'Commercial Short', 'traders_comm_short_all'),
-            ('avg_rept_long', 'Total Long', 'traders_tot_rept_long_all'),
-            ('avg_rept_short', 'Total Short', 'traders_tot_rept_short_all')
-        ]
-        
-        # Calculate percentiles for each category
-        percentile_data_dict = {}
-        for col, title, trader_col in categories:
-            percentile_data_dict[col] = calculate_percentiles_for_column(df_plot, col, lookback_days)
+        # Average position per trader and percentiles (cached across reruns)
+        df_plot = compute_participation_metrics(df, lookback_days, tuple(col for col, title, trader_col in categories))
         
         # Create subplot figure - 2 rows per category (value + percentile)
         num_categories = len(categories)
@@ -105,14 +81,7 @@ def create_participation_density_dashboard_original(df, instrument_name, percent
             shared_xaxes=True,
             vertical_spacing=0.02,
             row_heights=[0.15, 0.08] * num_categories,  # Alternating heights for value and percentile
-            specs=[[{"secondary_y": True}]] + [[{"secondary_y": False}]] + 
-                  [[{"secondary_y": True}]] + [[{"secondary_y": False}]] + 
-                  [[{"secondary_y": True}]] + [[{"secondary_y": False}]] + 
-                  [[{"secondary_y": True}]] + [[{"secondary_y": False}]] + 
-                  [[{"secondary_y": True}]] + [[{"secondary_y": False}]] + 
-                  [[{"secondary_y": True}]] + [[{"secondary_y": False}]] + 
-                  [[{"secondary_y": True}]] + [[{"secondary_y": False}]] + 
-                  [[{"secondary_y": True}]] + [[{"secondary_y": False}]],
+            specs=[[{"secondary_y": row % 2 == 0}] for row in range(num_categories * 2)],
             subplot_titles=[title if j == 0 else "" for col, title, trader_col in categories for j in range(2)],  # Title only on value charts, not percentile
             horizontal_spacing=0.01
         )
@@ -151,7 +120,7 @@ def create_participation_density_dashboard_original(df, instrument_name, percent
             fig.add_trace(
                 go.Scatter(
                     x=df_plot['report_date_as_yyyy_mm_dd'],
-                    y=percentile_data_dict[col],
+                    y=df_plot[f'{col}_percentile'],
                     name=f'{title} Percentile',
                     fill='tozeroy',
                     line=dict(color='purple', width=1),
@@ -753,8 +722,8 @@ def display_momentum_chart(df, instrument_name):
             key="momentum_date_range"
         )
     
-    # Filter data based on selection
-    df_filtered = df.copy()
+    # Filter data based on selection (the dashboard copies only the selected range)
+    df_filtered = df
     
     if date_range_option != "All Time":
         end_date = df['report_date_as_yyyy_mm_dd'].max()
@@ -905,43 +874,16 @@ def display_trader_participation_chart(df, instrument_name):
         }
             lookback_days = lookback_map[lookback_period]
             
-            # Calculate percentile based on selected lookback
-            if lookback_days == "since_2010":
-                lookback_date = pd.Timestamp('2010-01-01')
-                df_lookback = df[df['report_date_as_yyyy_mm_dd'] >= lookback_date].copy()
-            elif lookback_days:
-                lookback_date = df['report_date_as_yyyy_mm_dd'].max() - pd.Timedelta(days=lookback_days)
-                df_lookback = df[df['report_date_as_yyyy_mm_dd'] >= lookback_date].copy()
-            else:
-                df_lookback = df.copy()
-            
-            # Calculate avg position per trader for all data
-            df['avg_position_per_trader'] = df['open_interest_all'] / df['traders_tot_all']
-            
-            # Calculate percentile for each point based on lookback window
-            percentile_data = []
-            for i in range(len(df)):
-                current_date = df.iloc[i]['report_date_as_yyyy_mm_dd']
-                if lookback_days == "since_2010":
-                    lookback_start = pd.Timestamp('2010-01-01')
-                    window_data = df[(df['report_date_as_yyyy_mm_dd'] >= lookback_start) & 
-                                   (df['report_date_as_yyyy_mm_dd'] <= current_date)]
-                elif lookback_days:
-                    lookback_start = current_date - pd.Timedelta(days=lookback_days)
-                    window_data = df[(df['report_date_as_yyyy_mm_dd'] >= lookback_start) & 
-                                   (df['report_date_as_yyyy_mm_dd'] <= current_date)]
-                else:
-                    window_data = df[df['report_date_as_yyyy_mm_dd'] <= current_date]
-                
-                if len(window_data) > 0:
-                    current_val = df.iloc[i]['avg_position_per_trader']
-                    percentile = (window_data['avg_position_per_trader'] < current_val).sum() / len(window_data) * 100
-                    percentile_data.append(percentile)
-                else:
-                    percentile_data.append(50)
+            # Percentile of avg position per trader over the selected lookback
+            # (derived locally - the cached input frame is left untouched)
+            df_sorted = df if df['report_date_as_yyyy_mm_dd'].is_monotonic_increasing else df.sort_values('report_date_as_yyyy_mm_dd')
+            avg_position_per_trader = df_sorted['open_interest_all'] / df_sorted['traders_tot_all']
+            percentile_data = rolling_percentile_ranks(
+                df_sorted['report_date_as_yyyy_mm_dd'], avg_position_per_trader.to_numpy(), lookback_days
+            )[:, 0]
             
             # Create participation density chart with percentile data
-            density_fig = create_participation_density_dashboard(df, instrument_name, percentile_data, concentration_type)
+            density_fig = create_participation_density_dashboard(df_sorted, instrument_name, percentile_data, concentration_type)
             
             # Update the percentile y-axis title dynamically with lookback period
             if density_fig:
@@ -973,7 +915,7 @@ def display_trader_participation_chart(df, instrument_name):
                 """)
             
             # Percentile lookback selector (same as original)
-            col_lookback, col_empty = st.columns([1, 3])
+            col_lookback, col_categories = st.columns([1, 3])
             with col_lookback:
                 lookback_period_original = st.selectbox(
                     "Percentile Lookback:",
@@ -982,6 +924,17 @@ def display_trader_participation_chart(df, instrument_name):
                     key="original_lookback"
                 )
             
+            # Category selector - metrics are only computed for the selected categories
+            category_titles = {col: title for col, title, trader_col, position_col in PARTICIPATION_CATEGORIES}
+            with col_categories:
+                selected_categories_original = st.multiselect(
+                    "Categories:",
+                    list(category_titles.keys()),
+                    default=list(category_titles.keys()),
+                    format_func=lambda x: category_titles[x],
+                    key="original_categories"
+                )
+            
             # Map lookback to days
             lookback_map_original = {
                 "6 Months": 180,
@@ -999,10 +952,13 @@ def display_trader_participation_chart(df, instrument_name):
                 df, 
                 instrument_name, 
                 None,  # percentile_data not used in original
-                lookback_days_original
+                lookback_days_original,
+                selected_categories_original
             )
             if fig_original:
                 st.plotly_chart(fig_original, use_container_width=True)
+            elif not selected_categories_original:
+                st.info("Please select at least one category to plot")
             else:
                 st.error("Unable to create original participation density dashboard")
         
@@ -1901,79 +1857,8 @@ def display_trader_participation_chart(df, instrument_name):
                 - Rapid regime cycling indicates unstable conditions
                 """)
             
-            # Calculate regime metrics directly here (matching legacyF.py exactly)
-            df_regime = df.copy()
-            window = 52
-            min_periods = 26
-            
-            # Step 1: Calculate all percentile metrics
-            df_regime['long_conc_pct'] = df_regime['conc_gross_le_4_tdr_long'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-            df_regime['short_conc_pct'] = df_regime['conc_gross_le_4_tdr_short'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-            
-            # Net positions
-            df_regime['comm_net'] = df_regime['comm_positions_long_all'] - df_regime['comm_positions_short_all']
-            df_regime['noncomm_net'] = df_regime['noncomm_positions_long_all'] - df_regime['noncomm_positions_short_all']
-            df_regime['comm_net_pct'] = df_regime['comm_net'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-            df_regime['noncomm_net_pct'] = df_regime['noncomm_net'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-            
-            # Flow intensity
-            df_regime['comm_flow'] = df_regime['comm_net'].diff()
-            df_regime['noncomm_flow'] = df_regime['noncomm_net'].diff()
-            df_regime['flow_intensity'] = abs(df_regime['comm_flow']) + abs(df_regime['noncomm_flow'])
-            df_regime['flow_pct'] = df_regime['flow_intensity'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-            
-            # Trader participation
-            df_regime['trader_total_pct'] = df_regime['traders_tot_all'].rolling(window, min_periods=min_periods).rank(pct=True) * 100
-            
-            # Heterogeneity placeholder
-            df_regime['heterogeneity_pct'] = 50
-            
-            # Step 2: Calculate regime extremity score
-            def distance_from_center(pct):
-                return abs(pct - 50) * 2
-            
-            df_regime['regime_extremity'] = df_regime.apply(lambda row: 
-                max(distance_from_center(row['long_conc_pct']), 
-                    distance_from_center(row['short_conc_pct'])) * 0.25 +
-                max(distance_from_center(row['comm_net_pct']), 
-                    distance_from_center(row['noncomm_net_pct'])) * 0.25 +
-                row['flow_pct'] * 0.25 +
-                row['heterogeneity_pct'] * 0.25
-            , axis=1)
-            
-            # Step 3: Detect regime
-            def detect_regime(row):
-                EXTREME_HIGH = 85
-                EXTREME_LOW = 15
-                MODERATE_HIGH = 70
-                MODERATE_LOW = 30
-                
-                if pd.isna(row['long_conc_pct']):
-                    return "Insufficient Data", "gray"
-                
-                # Check patterns
-                if row['long_conc_pct'] > EXTREME_HIGH and row['short_conc_pct'] < MODERATE_LOW:
-                    return "Long Concentration Extreme", "red"
-                elif row['short_conc_pct'] > EXTREME_HIGH and row['long_conc_pct'] < MODERATE_LOW:
-                    return "Short Concentration Extreme", "red"
-                elif row['long_conc_pct'] > EXTREME_HIGH and row['short_conc_pct'] > EXTREME_HIGH:
-                    return "Bilateral Concentration", "orange"
-                elif row['noncomm_net_pct'] > EXTREME_HIGH and row['comm_net_pct'] < EXTREME_LOW:
-                    return "Speculative Long Extreme", "red"
-                elif row['noncomm_net_pct'] < EXTREME_LOW and row['comm_net_pct'] > EXTREME_HIGH:
-                    return "Commercial Long Extreme", "orange"
-                elif row['flow_pct'] > EXTREME_HIGH:
-                    return "High Flow Volatility", "yellow"
-                elif row['heterogeneity_pct'] > EXTREME_HIGH:
-                    return "Maximum Divergence", "red"
-                elif row['regime_extremity'] < 40:
-                    return "Balanced Market", "green"
-                else:
-                    return "Transitional", "gray"
-            
-            df_regime[['regime', 'regime_color']] = df_regime.apply(
-                lambda row: pd.Series(detect_regime(row)), axis=1
-            )
+            # Calculate regime metrics (shared with the regime detection chart)
+            df_regime = compute_regime_metrics(df)
             
             # Create visualization
             latest = df_regime.iloc[-1]
@@ -2148,36 +2033,8 @@ def display_trader_participation_chart(df, instrument_name):
             # Get last 52 weeks of regime data
             timeline_data = df_regime.tail(52).copy()
             
-            # Create color mapping
-            color_map = {
-            'Long Concentration Extreme': 'darkred',
-            'Short Concentration Extreme': 'darkred',
-            'Bilateral Concentration': 'orange',
-            'Speculative Long Extreme': 'red',
-            'Commercial Long Extreme': 'darkorange',
-            'High Flow Volatility': 'gold',
-            'Maximum Divergence': 'darkred',
-            'Balanced Market': 'green',
-            'Transitional': 'gray',
-            'Insufficient Data': 'lightgray'
-        }
-            
-            # Add all possible regimes to ensure complete legend
-            all_regimes = [
-            'Long Concentration Extreme',
-            'Short Concentration Extreme', 
-            'Bilateral Concentration',
-            'Speculative Long Extreme',
-            'Commercial Long Extreme',
-            'High Flow Volatility',
-            'Maximum Divergence',
-            'Balanced Market',
-            'Transitional',
-            'Insufficient Data'
-        ]
-            
             # Add regime bars - include all regimes for complete legend
-            for regime in all_regimes:
+            for regime, color in REGIME_COLORS.items():
                 regime_mask = timeline_data['regime'] == regime
                 if regime_mask.sum() > 0:
                     # Regime exists in data
@@ -2185,7 +2042,7 @@ def display_trader_participation_chart(df, instrument_name):
                         x=timeline_data.loc[regime_mask, 'report_date_as_yyyy_mm_dd'],
                         y=[1] * regime_mask.sum(),
                         name=regime,
-                        marker_color=color_map.get(regime, 'gray'),
+                        marker_color=color,
                         hovertemplate='%{x}<br>' + regime + '<extra></extra>',
                         showlegend=True
                     ))
@@ -2195,7 +2052,7 @@ def display_trader_participation_chart(df, instrument_name):
                         x=[],
                         y=[],
                         name=regime,
-                        marker_color=color_map.get(regime, 'gray'),
+                        marker_color=color,
                         showlegend=True
                     ))
             
@@ -81,7 +81,10 @@ def load_historical_data():
         df = df.rename(columns=existing_columns)
         
         # Convert date column
-        df['report_date_as_yyyy_mm_dd'] = pd.to_datetime(df['report_date_as_yyyy_mm_dd'])
+        df['report_date_as_yyyy_mm_dd'] = pd.to_datetime(df['report_date_as_yyyy_mm_dd'], format='%Y-%m-%d', cache=True)
+        
+        # Instrument names repeat across thousands of rows - store them as categories
+        df['market_and_exchange_names'] = df['market_and_exchange_names'].astype('category')
         
         # Clean numeric columns (remove spaces and convert)
         numeric_columns = [col for col in df.columns if col in column_mapping.values() and 
@@ -0,0 +1,105 @@
+"""
+Vectorized rolling percentile ranks for CFTC COT data
+Shared by the participation and percentile views
+"""
+import numpy as np
+import pandas as pd
+
+# Rows ranked per vectorized step - bounds the (rows x window) boolean temporaries
+ROW_BLOCK_SIZE = 256
+
+
+def rolling_percentile_ranks(dates, values, lookback, min_periods=1, fill_value=50.0):
+    """
+    Percentile rank of each row within its trailing calendar window
+
+    Args:
+        dates: Sorted report dates (datetime64 array or Series)
+        values: Array of shape (T,) or (T, K) - one column per metric
+        lookback: Days of history, a pd.DateOffset, "since_2010", or None for all time
+        min_periods: Minimum number of valid window values required for a rank
+        fill_value: Value used where no rank is available
+
+    Returns:
+        Array of shape (T, K) with the share of valid window values strictly
+        below the current value (0-100); fill_value where no rank is available
+    """
+    dates = np.asarray(dates)
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+
+    n, k = values.shape
+    percentiles = np.full((n, k), fill_value, dtype=float)
+    if n == 0:
+        return percentiles
+
+    # Window geometry is shared by every column: rows [start, end)
+    end = np.searchsorted(dates, dates, side='right')
+    if lookback == "since_2010":
+        lookback_start = pd.Timestamp('2010-01-01').to_datetime64()
+        start = np.full(n, np.searchsorted(dates, lookback_start, side='left'))
+    elif isinstance(lookback, pd.DateOffset):
+        window_starts = (pd.DatetimeIndex(dates) - lookback).to_numpy()
+        start = np.searchsorted(dates, window_starts, side='left')
+    elif lookback:
+        start = np.searchsorted(dates, dates - np.timedelta64(lookback, 'D'), side='left')
+    else:
+        start = np.zeros(n, dtype=int)
+    start = np.minimum(start, end)
+
+    # Rows are ranked in fixed-size blocks so temporaries stay at block x span,
+    # even for expanding windows where a window covers the whole history
+    valid_values = ~np.isnan(values)
+    for block_start in range(0, n, ROW_BLOCK_SIZE):
+        rows = slice(block_start, min(block_start + ROW_BLOCK_SIZE, n))
+        span_start, span_end = int(start[rows].min()), int(end[rows].max())
+        offsets = np.arange(span_start, span_end)
+        in_window = (offsets >= start[rows, None]) & (offsets < end[rows, None])
+
+        for col in range(k):
+            current = values[rows, col]
+            span = values[span_start:span_end, col]
+
+            valid = in_window & valid_values[span_start:span_end, col]
+            below = valid & (span < current[:, None])
+
+            valid_counts = valid.sum(axis=1)
+            has_data = (valid_counts >= max(min_periods, 1)) & ~np.isnan(current)
+            percentiles[rows, col][has_data] = below.sum(axis=1)[has_data] / valid_counts[has_data] * 100
+
+    return percentiles
+
+    # Window geometry is shared by every column: rows [start, end)
+    end = np.searchsorted(dates, dates, side='right')
+    if lookback == "since_2010":
+        lookback_start = pd.Timestamp('2010-01-01').to_datetime64()
+        start = np.full(n, np.searchsorted(dates, lookback_start, side='left'))
+    elif isinstance(lookback, pd.DateOffset):
+        window_starts = (pd.DatetimeIndex(dates) - lookback).to_numpy()
+        start = np.searchsorted(dates, window_starts, side='left')
+    elif lookback:
+        start = np.searchsorted(dates, dates - np.timedelta64(lookback, 'D'), side='left')
+    else:
+        start = np.zeros(n, dtype=int)
+    start = np.minimum(start, end)
+
+    width = max(int((end - start).max()), 1)
+    positions = end[:, None] - width + np.arange(width)
+    in_window = positions >= start[:, None]
+
+    # Left-pad with NaN so every window has the same width
+    padding = np.full(width, np.nan)
+    for col in range(k):
+        column = values[:, col]
+        padded = np.concatenate([padding, column])
+        windows = np.lib.stride_tricks.sliding_window_view(padded, width)[end]
+
+        valid = in_window & ~np.isnan(windows)
+        below = valid & (windows < column[:, None])
+
+        valid_counts = valid.sum(axis=1)
+        has_data = (valid_counts >= max(min_periods, 1)) & ~np.isnan(column)
+        percentiles[has_data, col] = below.sum(axis=1)[has_data] / valid_counts[has_data] * 100
+
+    return percentiles